@@ -1,9 +1,24 @@
 import tkinter as tk
-from tkinter import ttk, colorchooser, messagebox
+from tkinter import ttk, colorchooser, messagebox, filedialog
 from functools import partial
 import subprocess 
 import os 
 import re 
+import itertools
+import tempfile
+import queue
+import threading
+import math
+import shutil
+import argparse
+import configparser
+import sys
+import concurrent.futures
+import gzip
+import json
+import socket
+import time
+from collections import Counter
 
 # --- Global Style Variables ---
 COLOR_PRIMARY = "#059669" # Emerald Green
@@ -22,9 +37,27 @@ RISK_COLORS = {
 TYPE_COLORS = {
     "Flatpak": "#3b82f6", # Blue
     "Snap": "#8b5cf6",    # Purple
-    "Native": "#6b7280"   # Gray
+    "Native": "#6b7280",  # Gray
+    "AppImage": "#ea580c", # Orange
+    "Nix": "#0891b2",     # Cyan
+    "Local": "#78716c"    # Stone
 }
 
+# Package types that run without any sandbox at all
+UNSANDBOXED_TYPES = ("Native", "AppImage", "Nix", "Local")
+
+
+def app_key(app):
+    """
+    Stable identity of an app across scans. File-based apps are keyed by path,
+    since the same file name can exist in more than one directory.
+    """
+    return (app['type'], app.get('path') or app['package_id'])
+
+
+# Where user configuration (policy rules, settings) is kept
+CONFIG_DIR = os.path.join(os.environ.get('XDG_CONFIG_HOME') or os.path.expanduser('~/.config'), 'appscope')
+
 # --- Fallback Data (Only used if ALL system scans fail) ---
 FALLBACK_APPDATA = [
     {"id": 1, "name": "Firefox (Fallback)", "type": "Native", "package_id": "firefox", "risk": "Low", "permissions": [{"id": 101, "name": "Network Access", "status": "Enabled"}]},
@@ -42,28 +75,82 @@ class SystemIntegrator:
     def __init__(self, initial_data):
         self.app_data = initial_data
         self.next_app_id = len(initial_data) + 1
-
-    def _run_system_command(self, command):
+        # One instance per registered plugin, so plugins can keep their own probe caches
+        self.scanners = [plugin_class(self) for plugin_class in SCANNER_PLUGINS]
+        self._scan_cache = {} # plugin name -> (fingerprint, rows)
+        self.failed_scanners = set() # plugin names that failed during the last scan
+        self.scan_stopped = False # True if the last scan was cut short by its should_stop check
+        self._app_ids = {} # app_key -> id, so an app keeps its id across rescans
+        # CPU seconds spent by scan threads and scan child processes (not the GUI)
+        self.scan_cpu_time = 0.0
+        self._cpu_lock = threading.Lock()
+        # Prepended to every scan command, e.g. to run them at low priority
+        self.command_prefix = []
+        # Serializes scans between the GUI and the background scheduler
+        self.scan_lock = threading.RLock()
+
+    def _account_cpu(self, seconds):
+        with self._cpu_lock:
+            self.scan_cpu_time += seconds
+
+    def _app_id(self, app):
+        key = app_key(app)
+        if key not in self._app_ids:
+            self._app_ids[key] = self.next_app_id
+            self.next_app_id += 1
+        return self._app_ids[key]
+
+    def find_app(self, key):
+        """Looks an app up by its stable app_key."""
+        return next((a for a in self.app_data if app_key(a) == key), None)
+
+    def _stream_system_command(self, command):
         """
-        Helper to run a system command and return output or raise error.
-        THIS IS NOW LIVE.
+        Runs a system command and yields its stdout line by line as it arrives.
+        Output is never buffered whole, so memory stays flat for large inventories.
+        stderr goes to a temporary file so a chatty command can't block the pipe.
         """
+        if self.command_prefix and not shutil.which(command[0]):
+            # Behind a prefix a missing binary would surface as the prefix's own error
+            print(f"Command not found: {command[0]}. Is the package manager installed?")
+            raise RuntimeError(f"Dependency Missing: {command[0]}")
+        stderr_file = tempfile.TemporaryFile(mode='w+')
         try:
-            # Executes the command (e.g., 'flatpak list').
-            result = subprocess.run(command, capture_output=True, text=True, check=True)
-            return result.stdout
-            
-        except subprocess.CalledProcessError as e:
-            # Errors will be printed to your terminal.
-            print(f"Command failed: {' '.join(command)}\nError: {e.stderr}")
-            raise RuntimeError(f"Command Failed: {command[0]}") from e
+            process = subprocess.Popen(self.command_prefix + command, stdout=subprocess.PIPE, stderr=stderr_file, text=True, bufsize=1)
         except FileNotFoundError:
+            stderr_file.close()
             print(f"Command not found: {command[0]}. Is the package manager installed?")
             raise RuntimeError(f"Dependency Missing: {command[0]}") from None
         except Exception as e:
+            stderr_file.close()
             print(f"An unexpected error occurred in system call: {e}")
             raise RuntimeError("System Command Failed") from e
 
+        finished = False
+        error = None
+        try:
+            for line in process.stdout:
+                yield line.rstrip('\n')
+            finished = True
+        finally:
+            # Consumer stopped early (or failed): don't leave the child running.
+            if not finished:
+                process.kill()
+            process.stdout.close()
+            # Reap with wait4 so the child's own CPU time can be charged to the scan
+            _, status, usage = os.wait4(process.pid, 0)
+            returncode = process.returncode = os.waitstatus_to_exitcode(status)
+            self._account_cpu(usage.ru_utime + usage.ru_stime)
+            if finished and returncode != 0:
+                stderr_file.seek(0)
+                error = stderr_file.read()
+            stderr_file.close()
+
+        if error is not None:
+            # Errors will be printed to your terminal.
+            print(f"Command failed: {' '.join(command)}\nError: {error}")
+            raise RuntimeError(f"Command Failed: {command[0]}")
+
     def _get_app_permissions(self, package_id, app_type):
         """
         Simulates parsing the actual permission status for a given app.
@@ -80,157 +167,233 @@ class SystemIntegrator:
             # Example: A Flatpak app will typically have some permissions
             permissions.append({"id": 301, "name": "Network Access", "status": "Denied" if "calculator" in package_id.lower() else "Enabled"})
             permissions.append({"id": 304, "name": "User Documents Folder", "status": "Read/Write"})
+            # Read from the app's real metadata and overrides (filesystems=host)
+            permissions.append({"id": 305, "name": "Host Filesystem Access", "status": "Enabled" if 'host' in self._flatpak_filesystems(package_id) else "Denied"})
         elif app_type == 'Snap':
             # Example: A Snap app might have home access
             permissions.append({"id": 202, "name": "Home Directory Access", "status": "Enabled"})
             permissions.append({"id": 201, "name": "Network Access", "status": "Enabled"})
-        elif app_type == 'Native': 
+        elif app_type in UNSANDBOXED_TYPES: 
             # Example: Native apps generally have broad access, often marked as "Unrestricted"
             permissions.append({"id": 101, "name": "System Access", "status": "Unrestricted"})
             permissions.append({"id": 102, "name": "Network Access", "status": "Enabled"})
         
         return permissions
 
-    def _scan_flatpak_apps(self):
-        """Scans and parses Flatpak applications using 'flatpak list'."""
-        flatpak_apps = []
-        try:
-            output = self._run_system_command(['flatpak', 'list', '--app', '--columns=application,name'])
-        except Exception:
-            return flatpak_apps # Return empty if flatpak command fails
-
-        if output:
-            lines = output.strip().split('\n')
-            for line in lines[1:]: # Skip header
-                parts = line.split('\t')
-                if len(parts) >= 2:
-                    package_id = parts[0].strip()
-                    app_name = parts[1].strip()
-                    
-                    flatpak_apps.append({
-                        "id": self.next_app_id,
-                        "name": app_name or package_id.split('.')[-1],
-                        "type": "Flatpak",
-                        "package_id": package_id,
-                        # Permissions are simulated status until full parsing is implemented
-                        "permissions": self._get_app_permissions(package_id, "Flatpak")
-                    })
-                    self.next_app_id += 1
-        return flatpak_apps
-
-    def _scan_snap_apps(self):
-        """Scans and parses Snap applications using 'snap list'."""
-        snap_apps = []
-        try:
-            output = self._run_system_command(['snap', 'list'])
-        except Exception:
-            return snap_apps # Return empty if snap command fails
-        
-        if output:
-            lines = output.strip().split('\n')
-            if len(lines) > 1:
-                for line in lines[1:]: # Skip header
-                    parts = re.split(r'\s+', line.strip())
-                    if len(parts) >= 2:
-                        package_id = parts[0]
-                        
-                        if package_id in ('core', 'snapd'):
-                            continue
-
-                        snap_apps.append({
-                            "id": self.next_app_id,
-                            "name": package_id.capitalize(),
-                            "type": "Snap",
-                            "package_id": package_id,
-                            # Permissions are simulated status until full parsing is implemented
-                            "permissions": self._get_app_permissions(package_id, "Snap")
-                        })
-                        self.next_app_id += 1
-        return snap_apps
-        
-    def _scan_apt_apps(self):
-        """
-        Scans and parses native APT applications using 'dpkg --get-selections'.
-        Filters for likely GUI applications.
-        """
-        native_apps = []
-        # Use simple 'dpkg -l' which doesn't require sudo to read package names
-        try:
-            output = self._run_system_command(['dpkg', '-l'])
-        except Exception:
-            return native_apps # Return empty if dpkg command fails
-            
-        if output:
-            lines = output.strip().split('\n')
-            for line in lines:
-                if line.startswith('ii'): # 'ii' means installed
-                    parts = line.split()
-                    package_id = parts[1]
-                    
-                    # Simple filter to grab common desktop apps and ignore libraries/dev tools
-                    is_desktop_app = any(keyword in package_id for keyword in [
-                        'firefox', 'chrome', 'discord', 'thunderbird', 'gimp', 'kdenlive', 
-                        'libreoffice', 'vlc', 'krita', 'gnome-shell', 'kde-plasma', 'app'
-                    ])
-
-                    # Basic check to exclude complex libraries and kernel modules
-                    if is_desktop_app and not any(ext in package_id for ext in ['dev', 'lib', 'common', 'data', 'doc', 'tools']):
-                        
-                        # Generate a cleaner name by capitalizing and splitting
-                        clean_name = package_id.replace('-', ' ').title()
-                        
-                        native_apps.append({
-                            "id": self.next_app_id,
-                            "name": clean_name,
-                            "type": "Native",
-                            "package_id": package_id,
-                            # Permissions are simulated status until full parsing is implemented
-                            "permissions": self._get_app_permissions(package_id, "Native")
-                        })
-                        self.next_app_id += 1
-        return native_apps
-
-
-    def scan_system(self):
-        """Runs all scanners and populates the app list."""
-        self.app_data = []
-        self.next_app_id = 1
-        app_list_from_system = []
-        scan_failed = False
+    def _flatpak_filesystems(self, package_id):
+        """
+        Effective 'filesystems' grants of a Flatpak app, read straight from its
+        metadata and then the system and user overrides ('!host' revokes 'host').
+        Plain file reads, so this stays cheap enough to run for every app.
+        """
+        user_dir = os.path.expanduser('~/.local/share/flatpak')
+        sources = [
+            os.path.join('/var/lib/flatpak/app', package_id, 'current/active/metadata'),
+            os.path.join(user_dir, 'app', package_id, 'current/active/metadata'),
+            os.path.join('/var/lib/flatpak/overrides', package_id),
+            os.path.join(user_dir, 'overrides', package_id),
+        ]
+        filesystems = set()
+        for path in sources:
+            parser = configparser.ConfigParser(interpolation=None, strict=False)
+            try:
+                parser.read(path, encoding='utf-8')
+            except (OSError, configparser.Error):
+                continue
+            for entry in parser.get('Context', 'filesystems', fallback='').split(';'):
+                entry = entry.strip()
+                if entry.startswith('!'):
+                    filesystems.discard(entry[1:])
+                elif entry:
+                    filesystems.add(entry)
+        return filesystems
+
+    # --- Streaming scan pipeline: parse -> filter -> enrich permissions -> score risk ---
+
+    def _run_scanner(self, plugin, emit, use_cache=True):
+        """
+        Feeds one plugin's filtered rows to emit(), tagged with the plugin's name.
+        Serves the rows from cache when the plugin's fingerprint hasn't changed
+        since its last successful scan. A failed scan raises and is never cached.
+        """
+        if not use_cache:
+            plugin.reset()
+        fingerprint = plugin.fingerprint()
+        cached = self._scan_cache.get(plugin.name)
+        if use_cache and fingerprint is not None and cached and cached[0] == fingerprint:
+            for record in cached[1]:
+                if not emit(dict(record, source=plugin.name)):
+                    return
+            return
+
+        rows = [] if fingerprint is not None else None
+        for record in plugin.scan():
+            if not plugin.include(record):
+                continue
+            if rows is not None:
+                rows.append(record)
+            if not emit(dict(record, source=plugin.name)):
+                return # Consumer went away; don't cache a partial scan
+        if rows is not None:
+            self._scan_cache[plugin.name] = (fingerprint, rows)
+
+    def _scan_rows(self, use_cache=True, should_stop=None):
+        """
+        Runs every registered scanner concurrently and yields their rows as they
+        arrive. A bounded queue keeps fast scanners from running far ahead.
+        Scanners that fail are collected in self.failed_scanners; rows they
+        yielded before failing have already been handed out.
+        should_stop() is polled between rows (and at least every 0.1s); once it
+        returns True the scan ends early and self.scan_stopped is set.
+        """
+        self.failed_scanners = set()
+        self.scan_stopped = False
+        rows = queue.Queue(maxsize=256)
+        stop = threading.Event()
+        finished = object()
+
+        def emit(item):
+            while not stop.is_set():
+                try:
+                    rows.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def worker(plugin):
+            charged = time.thread_time()
+
+            def charge():
+                # Charge CPU as we go so a should_stop() budget check sees it mid-scan
+                nonlocal charged
+                now = time.thread_time()
+                self._account_cpu(now - charged)
+                charged = now
+
+            def emit_row(item):
+                charge()
+                return emit(item)
+
+            try:
+                self._run_scanner(plugin, emit_row, use_cache)
+            except Exception as e:
+                print(f"Scanner '{plugin.name}' failed: {e}")
+                self.failed_scanners.add(plugin.name)
+            finally:
+                charge()
+                emit(finished)
+
+        for plugin in self.scanners:
+            threading.Thread(target=worker, args=(plugin,), daemon=True).start()
 
         try:
-            app_list_from_system.extend(self._scan_flatpak_apps())
-            app_list_from_system.extend(self._scan_snap_apps())
-            app_list_from_system.extend(self._scan_apt_apps()) # NEW APT SCAN
-            
-        except RuntimeError:
-            scan_failed = True
+            remaining = len(self.scanners)
+            while remaining:
+                try:
+                    item = rows.get(timeout=0.1)
+                except queue.Empty:
+                    item = None
+                if should_stop and should_stop():
+                    self.scan_stopped = True
+                    return
+                if item is None:
+                    continue
+                if item is finished:
+                    remaining -= 1
+                else:
+                    yield item
+        finally:
+            stop.set()
+
+    def _enrich_permissions(self, records):
+        """Assigns a stable id and the permission list to each row."""
+        for record in records:
+            record['id'] = self._app_id(record)
+            # Permissions are simulated status until full parsing is implemented
+            record['permissions'] = self._get_app_permissions(record['package_id'], record['type'])
+            yield record
+
+    def _score_risk(self, records):
+        """Calculates the risk level of each row."""
+        for record in records:
+            record['risk'] = self.calculate_risk(record)
+            yield record
+
+    def iter_apps(self, use_cache=True, should_stop=None):
+        """
+        Streams fully processed app records one at a time from all scanners.
+        Nothing is held beyond the record currently being handed to the consumer
+        (apart from each cacheable scanner's own rows).
+        """
+        return self._score_risk(self._enrich_permissions(self._scan_rows(use_cache, should_stop)))
 
-        if not app_list_from_system:
-            print("Loading full fallback data due to empty scan results.")
-            self.app_data = FALLBACK_APPDATA
-            scan_failed = True
-        else:
-            self.app_data = app_list_from_system
+    def scan_system(self, use_cache=True, should_stop=None):
+        """
+        Runs all scanners and populates the app list.
+        If should_stop() cuts the scan short, the previous app list is kept and
+        returned unchanged (check self.scan_stopped).
+        """
+        scan_failed = False
 
-        # Calculate risk for all loaded apps
-        for app in self.app_data:
-            app['risk'] = self.calculate_risk(app)
+        with self.scan_lock:
+            app_list_from_system = list(self.iter_apps(use_cache, should_stop))
+            if self.scan_stopped:
+                return self.app_data, scan_failed
+
+            if self.failed_scanners:
+                # Like a failed command before streaming: report nothing from a failed source
+                scan_failed = True
+                app_list_from_system = [app for app in app_list_from_system if app['source'] not in self.failed_scanners]
+
+            # Scanner threads finish in any order; list apps in registry order (Flatpak, Snap, Native, ...)
+            # so identical scans give identical lists. The sort is stable, so each plugin keeps its own order.
+            plugin_order = {plugin.name: index for index, plugin in enumerate(self.scanners)}
+            app_list_from_system.sort(key=lambda app: plugin_order[app['source']])
+
+            if not app_list_from_system:
+                print("Loading full fallback data due to empty scan results.")
+                app_list_from_system = FALLBACK_APPDATA
+                scan_failed = True
+                # Calculate risk and ids for the fallback apps
+                for app in app_list_from_system:
+                    app['id'] = self._app_id(app)
+                    app['risk'] = self.calculate_risk(app)
+
+            # Swap in the finished list so readers never see a half-built one
+            self.app_data = app_list_from_system
         
         return self.app_data, scan_failed
+
+    def changed_scanners(self):
+        """
+        Cheap check for which scanners' sources changed since their last scan.
+        Only fingerprints are computed; no package manager is run.
+        """
+        changed = []
+        for plugin in self.scanners:
+            cached = self._scan_cache.get(plugin.name)
+            try:
+                fingerprint = plugin.fingerprint()
+            except Exception as e:
+                print(f"Scanner '{plugin.name}' fingerprint failed: {e}")
+                continue
+            if fingerprint is not None and (cached is None or cached[0] != fingerprint):
+                changed.append(plugin.name)
+        return changed
         
     def calculate_risk(self, app):
         """Dynamically calculates the risk level based on package type and permissions."""
         score = 0
-        risk_map = {"Flatpak": 1, "Snap": 2, "Native": 4} # Native is highest risk due to lack of standard sandbox
+        risk_map = {"Flatpak": 1, "Snap": 2, "Native": 4, "AppImage": 4, "Nix": 4, "Local": 4} # Unsandboxed types are highest risk
         score += risk_map.get(app['type'], 2)
         
         for p in app['permissions']:
             if p['status'] in ('Enabled', 'Read/Write', 'Unrestricted'):
                 if "Root Access" in p['name'] or "Unrestricted" in p['name']:
                     score += 5 
-                elif "Network Access" in p['name'] and app['type'] == 'Native':
-                    score += 2 # Native networking is generally a medium risk
+                elif "Network Access" in p['name'] and app['type'] in UNSANDBOXED_TYPES:
+                    score += 2 # Unsandboxed networking is generally a medium risk
                 elif "Home Directory" in p['name'] and app['type'] in ('Snap', 'Flatpak'):
                     score += 3 
 
@@ -241,12 +404,13 @@ class SystemIntegrator:
         else:
             return "Low"
 
-    def update_permission(self, app_id, permission_id, new_status):
+    def update_permission(self, key, permission_id, new_status):
         """
         Executes the command to change a permission using 'pkexec' for elevation.
+        The app is identified by its app_key.
         """
-        app = next((a for a in self.app_data if a['id'] == app_id), None)
-        permission = next((p for p in app['permissions'] if p['id'] == permission_id), None)
+        app = self.find_app(key)
+        permission = next((p for p in app['permissions'] if p['id'] == permission_id), None) if app else None
 
         if app and permission:
             command = []
@@ -273,18 +437,22 @@ class SystemIntegrator:
             # After a successful change, re-scan the system to verify and update the list.
             self.app_data, _ = self.scan_system()
             # If full parsing were implemented, this would fetch the REAL new status.
-            # For now, we update the local object to match the user's intent.
-            permission['status'] = new_status
-            app['risk'] = self.calculate_risk(app) 
+            # For now, we update the rescanned object to match the user's intent.
+            app = self.find_app(key)
+            permission = next((p for p in app['permissions'] if p['id'] == permission_id), None) if app else None
+            if permission:
+                permission['status'] = new_status
+                app['risk'] = self.calculate_risk(app) 
             # -----------------------------------
             return True
         return False
 
-    def uninstall_app(self, app_id):
+    def uninstall_app(self, key):
         """
         Executes the command to uninstall an application using 'pkexec' for elevation.
+        The app is identified by its app_key.
         """
-        app = next((a for a in self.app_data if a['id'] == app_id), None)
+        app = self.find_app(key)
         if app:
             command = []
             try:
@@ -295,6 +463,15 @@ class SystemIntegrator:
                 elif app['type'] == 'Native': 
                     # Use remove command for native packages
                     command = ['pkexec', 'apt', 'remove', app['package_id'], '-y'] 
+                elif app['type'] == 'Nix':
+                    # Nix profiles belong to the user, no elevation needed
+                    command = ['nix-env', '--uninstall', app['package_id']]
+                elif app['type'] == 'AppImage':
+                    # An AppImage is just a file; removing it uninstalls it
+                    os.remove(app['path'])
+                else:
+                    print(f"Uninstall not supported for {app['type']} apps: {app['package_id']}")
+                    return False
                 
                 if command:
                     # LIVE EXECUTION
@@ -303,12 +480,1006 @@ class SystemIntegrator:
             except subprocess.CalledProcessError as e:
                 print(f"Uninstall FAILED: {' '.join(command)} - {e}")
                 return False
+            except OSError as e:
+                print(f"Uninstall FAILED: {app.get('path', app['package_id'])} - {e}")
+                return False
             
             # If system command succeeds, update state
-            self.app_data = [a for a in self.app_data if a['id'] != app_id]
+            self.app_data = [a for a in self.app_data if app_key(a) != key]
             return True
         return False
+
+    def export_snapshot(self, path, apps=None):
+        """
+        Writes a compact, versioned snapshot of the app list for fleet reporting.
+        The file is gzip-compressed JSON lines: one header object, then one
+        array per app so readers can stream it back without loading it whole.
+        """
+        apps = self.app_data if apps is None else apps
+        header = {
+            "format": SNAPSHOT_FORMAT,
+            "version": SNAPSHOT_VERSION,
+            "host": socket.gethostname(),
+            "created": int(time.time()),
+        }
+        with gzip.open(path, 'wt', encoding='utf-8') as f:
+            f.write(json.dumps(header, separators=(',', ':')) + '\n')
+            for app in apps:
+                row = [app['type'], app['package_id'], app['name'], app['risk'],
+                       [[p['name'], p['status']] for p in app['permissions']]]
+                f.write(json.dumps(row, separators=(',', ':')) + '\n')
+        return path
         
+# --- Scanner Plugins (One per package source) ---
+
+SCANNER_PLUGINS = []
+
+def register_scanner(plugin_class):
+    """Class decorator that adds a scanner plugin to the registry used by SystemIntegrator."""
+    SCANNER_PLUGINS.append(plugin_class)
+    return plugin_class
+
+
+def _mtime_fingerprint(*paths):
+    """Cheap fingerprint from the modification times of a few files or directories."""
+    fingerprint = []
+    for path in paths:
+        try:
+            fingerprint.append((path, os.stat(path).st_mtime_ns))
+        except OSError:
+            fingerprint.append((path, None))
+    return tuple(fingerprint)
+
+
+class ScannerPlugin:
+    """
+    Base class for package-source scanners.
+    scan() yields raw rows ({"name", "type", "package_id", ...}) and lets a
+    failed command's RuntimeError propagate, include() drops rows that aren't
+    user-facing apps, and fingerprint() returns a cheap value that changes
+    whenever the source does (None means never cache).
+    Plugins run concurrently, each in its own thread.
+    """
+    name = None
+
+    def __init__(self, integrator):
+        self.integrator = integrator
+
+    def fingerprint(self):
+        return None
+
+    def reset(self):
+        """Drops any internal caches before a deep scan."""
+
+    def scan(self):
+        raise NotImplementedError
+
+    def include(self, record):
+        return True
+
+
+@register_scanner
+class FlatpakScanner(ScannerPlugin):
+    """Flatpak applications from 'flatpak list'."""
+    name = "flatpak"
+
+    def fingerprint(self):
+        return _mtime_fingerprint('/var/lib/flatpak/app', os.path.expanduser('~/.local/share/flatpak/app'))
+
+    def scan(self):
+        if not shutil.which('flatpak'):
+            return # Not installed: nothing to report, and nothing failed
+        lines = self.integrator._stream_system_command(['flatpak', 'list', '--app', '--columns=application,name'])
+        next(lines, None) # Skip header
+        for line in lines:
+            parts = line.split('\t')
+            if len(parts) >= 2:
+                package_id = parts[0].strip()
+                app_name = parts[1].strip()
+                yield {"name": app_name or package_id.split('.')[-1], "type": "Flatpak", "package_id": package_id}
+
+
+@register_scanner
+class SnapScanner(ScannerPlugin):
+    """Snap applications from 'snap list'."""
+    name = "snap"
+
+    def fingerprint(self):
+        return _mtime_fingerprint('/var/lib/snapd/state.json')
+
+    def scan(self):
+        if not shutil.which('snap'):
+            return # Not installed: nothing to report, and nothing failed
+        lines = self.integrator._stream_system_command(['snap', 'list'])
+        next(lines, None) # Skip header
+        for line in lines:
+            parts = re.split(r'\s+', line.strip())
+            if len(parts) >= 2:
+                yield {"name": parts[0].capitalize(), "type": "Snap", "package_id": parts[0]}
+
+    def include(self, record):
+        return record['package_id'] not in ('core', 'snapd')
+
+
+@register_scanner
+class AptScanner(ScannerPlugin):
+    """Installed native packages from 'dpkg -l', filtered to likely GUI applications."""
+    name = "apt"
+
+    def fingerprint(self):
+        return _mtime_fingerprint('/var/lib/dpkg/status')
+
+    def scan(self):
+        if not shutil.which('dpkg'):
+            return # Not a Debian-based system
+        # Use simple 'dpkg -l' which doesn't require sudo to read package names
+        for line in self.integrator._stream_system_command(['dpkg', '-l']):
+            if line.startswith('ii'): # 'ii' means installed
+                package_id = line.split()[1]
+                # Generate a cleaner name by capitalizing and splitting
+                yield {"name": package_id.replace('-', ' ').title(), "type": "Native", "package_id": package_id}
+
+    def include(self, record):
+        package_id = record['package_id']
+        # Simple filter to grab common desktop apps and ignore libraries/dev tools
+        is_desktop_app = any(keyword in package_id for keyword in [
+            'firefox', 'chrome', 'discord', 'thunderbird', 'gimp', 'kdenlive', 
+            'libreoffice', 'vlc', 'krita', 'gnome-shell', 'kde-plasma', 'app',
+            'anydesk', 'teamviewer' # Remote desktop tools, flagged by the default policy
+        ])
+        # Basic check to exclude complex libraries and kernel modules
+        return is_desktop_app and not any(ext in package_id for ext in ['dev', 'lib', 'common', 'data', 'doc', 'tools'])
+
+
+@register_scanner
+class NixScanner(ScannerPlugin):
+    """Packages in the user's Nix profile from 'nix-env -q'."""
+    name = "nix"
+    profile = os.path.expanduser('~/.nix-profile')
+
+    def fingerprint(self):
+        # Every install/remove switches the profile link to a new generation
+        return os.path.realpath(self.profile)
+
+    def scan(self):
+        if not os.path.exists(self.profile) or not shutil.which('nix-env'):
+            return
+        for line in self.integrator._stream_system_command(['nix-env', '--query', '--installed']):
+            package_id = line.strip()
+            if package_id:
+                # 'hello-2.12.1' -> 'hello'
+                name = re.sub(r'-\d[^-]*$', '', package_id)
+                yield {"name": name.replace('-', ' ').title(), "type": "Nix", "package_id": package_id}
+
+
+class FileScanner(ScannerPlugin):
+    """
+    Base for scanners that identify apps by reading file headers in a few
+    directories. Headers are probed in parallel and each file's result is
+    cached by path + mtime, so unchanged files are never read twice.
+    """
+    directories = ()
+    header_size = 16
+
+    def __init__(self, integrator):
+        super().__init__(integrator)
+        self._probe_cache = {} # path -> (mtime_ns, record or None)
+
+    def _list_files(self):
+        for directory in self.directories:
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_file():
+                            yield entry.path, entry.stat().st_mtime_ns
+            except OSError:
+                continue
+
+    def fingerprint(self):
+        return tuple(sorted(self._list_files()))
+
+    def reset(self):
+        self._probe_cache.clear()
+
+    def _probe(self, path):
+        start = time.thread_time()
+        try:
+            with open(path, 'rb') as f:
+                return self.classify(path, f.read(self.header_size))
+        except OSError:
+            return None
+        finally:
+            self.integrator._account_cpu(time.thread_time() - start)
+
+    def classify(self, path, header):
+        """Returns a row for the file, or None if it isn't one of ours."""
+        raise NotImplementedError
+
+    def scan(self):
+        files = dict(self._list_files())
+        changed = [path for path, mtime in files.items()
+                   if path not in self._probe_cache or self._probe_cache[path][0] != mtime]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+            for path, record in zip(changed, executor.map(self._probe, changed)):
+                self._probe_cache[path] = (files[path], record)
+
+        # Forget files that have disappeared
+        for path in list(self._probe_cache):
+            if path not in files:
+                del self._probe_cache[path]
+
+        for path in sorted(files):
+            record = self._probe_cache[path][1]
+            if record:
+                yield dict(record)
+
+
+def _is_appimage(header):
+    """ELF magic followed by the AppImage type 1/2 magic ('AI' + type byte) at offset 8."""
+    return header[:4] == b'\x7fELF' and header[8:10] == b'AI' and header[10:11] in (b'\x01', b'\x02')
+
+
+@register_scanner
+class AppImageScanner(FileScanner):
+    """AppImages identified by their ELF/AppImage magic headers."""
+    name = "appimage"
+    directories = tuple(os.path.expanduser(d) for d in ('~/Applications', '~/AppImages', '~/.local/bin'))
+
+    def classify(self, path, header):
+        if not _is_appimage(header):
+            return None
+        filename = os.path.basename(path)
+        # 'Obsidian-1.5.3.AppImage' -> 'Obsidian'
+        name = re.sub(r'(-[\d.]+.*)?\.appimage$', '', filename, flags=re.IGNORECASE)
+        return {"name": name.replace('_', ' ') or filename, "type": "AppImage", "package_id": filename, "path": path}
+
+
+@register_scanner
+class LocalBinaryScanner(FileScanner):
+    """User-local executables (pip console scripts, manual installs) outside any package manager."""
+    name = "local"
+    directories = (os.path.expanduser('~/.local/bin'), '/usr/local/bin')
+
+    def classify(self, path, header):
+        # AppImages in ~/.local/bin are reported by AppImageScanner instead
+        if _is_appimage(header) or not os.access(path, os.X_OK):
+            return None
+        if not (header.startswith(b'\x7fELF') or header.startswith(b'#!')):
+            return None
+        filename = os.path.basename(path)
+        return {"name": filename, "type": "Local", "package_id": filename, "path": path}
+
+
+# --- Fleet Reporting (Aggregates exported snapshots from many hosts) ---
+
+SNAPSHOT_FORMAT = "appscope-snapshot"
+SNAPSHOT_VERSION = 1
+
+
+def _read_snapshot_header(f, path):
+    """Reads and validates the header line of an open snapshot file."""
+    header = json.loads(f.readline() or 'null')
+    if not isinstance(header, dict) or header.get('format') != SNAPSHOT_FORMAT:
+        raise ValueError(f"Not an AppScope snapshot: {path}")
+    if header.get('version') != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version {header.get('version')}: {path}")
+    # These drive per-host dedup and report sorting, so a bad type must skip the file, not abort the report
+    created = header.get('created')
+    if not isinstance(created, int) or isinstance(created, bool):
+        raise ValueError(f"Snapshot 'created' must be an integer timestamp: {path}")
+    host = header.get('host')
+    if host is not None and not isinstance(host, str):
+        raise ValueError(f"Snapshot 'host' must be a string: {path}")
+    header['host'] = host or os.path.basename(path)
+    return header
+
+
+def iter_snapshot(path):
+    """
+    Yields (host, app) pairs from a snapshot file one app at a time.
+    Raises ValueError if the file isn't a snapshot this version understands.
+    """
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        host = _read_snapshot_header(f, path)['host']
+        for line in f:
+            app_type, package_id, name, risk, permissions = json.loads(line)
+            yield host, {
+                "name": name,
+                "type": app_type,
+                "package_id": package_id,
+                "risk": risk,
+                "permissions": [{"name": p_name, "status": status} for p_name, status in permissions],
+            }
+
+
+def iter_snapshot_paths(directory):
+    """Yields snapshot file paths under a directory without listing it all up front."""
+    for root, _, files in os.walk(directory):
+        for filename in files:
+            if filename.endswith('.jsonl.gz'):
+                yield os.path.join(root, filename)
+
+
+def _snapshot_headers(paths):
+    """
+    Reads only the header of each snapshot in a batch (worker process).
+    Returns (path, host, created) tuples, with host None for unreadable files.
+    """
+    headers = []
+    for path in paths:
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                header = _read_snapshot_header(f, path)
+            headers.append((path, header['host'], header['created']))
+        except (OSError, EOFError, ValueError, TypeError) as e:
+            print(f"Skipping unreadable snapshot {path}: {e}")
+            headers.append((path, None, 0))
+    return headers
+
+
+def _summarize_snapshots(paths):
+    """
+    Reduces a batch of snapshots to counters. Runs in a worker process, so only
+    the small summary (never the snapshots themselves) travels back to the parent.
+    """
+    summary = {
+        "hosts": 0,
+        "skipped": 0,
+        "packages": Counter(),    # (type, package_id) -> hosts with it installed
+        "permissions": Counter(), # (type, permission name, status) -> count
+        "risk": Counter(),        # (type, risk) -> count
+        "high_risk": {},          # host -> [package_id, ...]
+    }
+    for path in paths:
+        # Count into per-snapshot counters first so a truncated file doesn't leave partial counts behind.
+        host = None
+        packages, permissions, risk, high_risk = Counter(), Counter(), Counter(), []
+        try:
+            for host, app in iter_snapshot(path):
+                packages[(app['type'], app['package_id'])] += 1
+                risk[(app['type'], app['risk'])] += 1
+                for p in app['permissions']:
+                    permissions[(app['type'], p['name'], p['status'])] += 1
+                if app['risk'] == 'High':
+                    high_risk.append(app['package_id'])
+        except (OSError, EOFError, ValueError, TypeError) as e:
+            print(f"Skipping unreadable snapshot {path}: {e}")
+            summary['skipped'] += 1
+            continue
+
+        summary['hosts'] += 1
+        summary['packages'].update(packages)
+        summary['permissions'].update(permissions)
+        summary['risk'].update(risk)
+        if high_risk:
+            summary['high_risk'].setdefault(host, []).extend(high_risk)
+    return summary
+
+
+class FleetAggregator:
+    """
+    Merges exported snapshots from many hosts into a single fleet report.
+    Only the latest snapshot of each host (by its 'created' time) is counted,
+    so re-exports don't inflate the numbers. Snapshots are parsed in parallel
+    worker processes in small batches, and only a bounded number of batches
+    are in flight, so memory use doesn't grow with the number of snapshots.
+    """
+
+    def __init__(self, workers=None, batch_size=64):
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.hosts = 0
+        self.skipped = 0
+        self.superseded = 0 # older snapshots of a host that has a newer one
+        self.packages = Counter()
+        self.permissions = Counter()
+        self.risk = Counter()
+        self.high_risk_hosts = {}
+
+    def _merge(self, summary):
+        self.hosts += summary['hosts']
+        self.skipped += summary['skipped']
+        self.packages.update(summary['packages'])
+        self.permissions.update(summary['permissions'])
+        self.risk.update(summary['risk'])
+        for host, package_ids in summary['high_risk'].items():
+            self.high_risk_hosts.setdefault(host, []).extend(package_ids)
+
+    def _map_batches(self, executor, function, items, on_result):
+        """Runs function over batches of items with a bounded number of batches in flight."""
+        items = iter(items)
+        max_in_flight = self.workers * 2
+        pending = set()
+        while True:
+            while len(pending) < max_in_flight:
+                batch = list(itertools.islice(items, self.batch_size))
+                if not batch:
+                    break
+                pending.add(executor.submit(function, batch))
+            if not pending:
+                break
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                on_result(future.result())
+
+    def add_snapshots(self, paths):
+        """
+        Parses and merges an iterable of snapshot paths (consumed lazily).
+        Pass every snapshot in one call: duplicates are resolved per call.
+        """
+        latest = {} # host -> (created, path)
+
+        def pick_latest(headers):
+            for path, host, created in headers:
+                if host is None:
+                    self.skipped += 1
+                elif host not in latest:
+                    latest[host] = (created, path)
+                else:
+                    self.superseded += 1
+                    if created > latest[host][0]:
+                        latest[host] = (created, path)
+
+        with concurrent.futures.ProcessPoolExecutor(max_workers=self.workers) as executor:
+            # Headers first (cheap), so only one snapshot per host is fully parsed
+            self._map_batches(executor, _snapshot_headers, paths, pick_latest)
+            self._map_batches(executor, _summarize_snapshots, (path for _, path in latest.values()), self._merge)
+        return self
+
+    def report(self):
+        """Builds the fleet report as plain dicts, grouped by package type."""
+        packages, permissions, risk = {}, {}, {}
+        for (app_type, package_id), count in self.packages.most_common():
+            packages.setdefault(app_type, {})[package_id] = count
+        for (app_type, p_name, status), count in sorted(self.permissions.items()):
+            permissions.setdefault(app_type, {}).setdefault(p_name, {})[status] = count
+        for (app_type, level), count in sorted(self.risk.items()):
+            risk.setdefault(app_type, {})[level] = count
+
+        return {
+            "format": "appscope-fleet-report",
+            "version": SNAPSHOT_VERSION,
+            "hosts": self.hosts,
+            "skipped": self.skipped,
+            "superseded": self.superseded,
+            "packages": packages,
+            "permissions": permissions,
+            "risk": risk,
+            "high_risk_hosts": {host: sorted(set(ids)) for host, ids in sorted(self.high_risk_hosts.items())},
+        }
+
+    def export_report(self, path):
+        """Writes the fleet report to a JSON file."""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=2)
+        return path
+
+# --- Compliance Policy Engine (Org rules on top of calculate_risk) ---
+
+POLICY_FILE = os.path.join(CONFIG_DIR, 'policy.json')
+GRANTED_STATUSES = ('Enabled', 'Read/Write', 'Unrestricted')
+POLICY_BULK_FRACTION = 0.25 # Share of changed apps above which sync() does a full indexed pass
+
+# Used when no policy file exists. Rule format (all keys except "id" optional):
+#   "type":        only apps of this package type
+#   "permissions": {permission name: [statuses]}; every entry must match.
+#                  An empty list means any granted status.
+#   "package":     regular expression searched in the package id
+DEFAULT_POLICY_RULES = [
+    {"id": "no-snap-home-network", "description": "Snap with both home and network access",
+     "severity": "High", "type": "Snap",
+     "permissions": {"Home Directory Access": [], "Network Access": []}},
+    {"id": "no-flatpak-host-filesystem", "description": "Flatpak with filesystem=host",
+     "severity": "High", "type": "Flatpak",
+     "permissions": {"Host Filesystem Access": []}},
+    {"id": "no-native-remote-desktop", "description": "Native remote desktop tools",
+     "severity": "Medium", "type": "Native",
+     "package": r"^(anydesk|teamviewer)"},
+]
+
+
+def load_policy_rules(path=POLICY_FILE):
+    """Reads policy rules from a JSON file ({"rules": [...]} or a bare list)."""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    rules = data.get('rules') if isinstance(data, dict) else data
+    if not isinstance(rules, list):
+        raise ValueError(f"Policy file has no rule list: {path}")
+    return rules
+
+
+class PolicyRule:
+    """A compiled policy rule: index terms for candidate lookup plus the full predicate."""
+
+    def __init__(self, spec):
+        if not isinstance(spec, dict) or not spec.get('id') or not isinstance(spec['id'], str):
+            raise ValueError(f"Policy rule without an id: {spec!r}")
+        unknown = set(spec) - {'id', 'description', 'severity', 'type', 'permissions', 'package'}
+        if unknown:
+            raise ValueError(f"Policy rule '{spec['id']}' has unknown keys: {', '.join(sorted(unknown))}")
+
+        self.id = spec['id']
+        for field in ('description', 'severity', 'type', 'package'):
+            if spec.get(field) is not None and not isinstance(spec[field], str):
+                raise ValueError(f"Policy rule '{self.id}': '{field}' must be a string")
+        self.description = spec.get('description', self.id)
+        self.severity = spec.get('severity', 'High')
+        self.app_type = spec.get('type')
+
+        permissions = spec.get('permissions') or {}
+        if not isinstance(permissions, dict):
+            raise ValueError(f"Policy rule '{self.id}': 'permissions' must map permission names to lists of statuses")
+        for name, statuses in permissions.items():
+            if not isinstance(statuses, list) or not all(isinstance(status, str) for status in statuses):
+                raise ValueError(f"Policy rule '{self.id}': statuses for '{name}' must be a list of strings")
+        # [(permission name, accepted statuses)], all of which must hold
+        self.permission_terms = [(name, frozenset(statuses or GRANTED_STATUSES))
+                                 for name, statuses in permissions.items()]
+        try:
+            self.package = re.compile(spec['package']) if spec.get('package') else None
+        except re.error as e:
+            raise ValueError(f"Policy rule '{self.id}' has an invalid package pattern: {e}") from None
+
+    def index_terms(self):
+        """
+        Terms an app must have at least one of to possibly match: the statuses
+        of the rule's first permission condition, else its type. [None] means
+        the rule can match any app.
+        """
+        if self.permission_terms:
+            name, accepted = self.permission_terms[0]
+            return [('permission', name, status) for status in accepted]
+        if self.app_type:
+            return [('type', self.app_type)]
+        return [None]
+
+    def matches(self, app):
+        """Evaluates the rule against a single app without any index."""
+        if self.app_type and app['type'] != self.app_type:
+            return False
+        if self.package and not self.package.search(app['package_id']):
+            return False
+        statuses = {p['name']: p['status'] for p in app['permissions']}
+        return all(statuses.get(name) in accepted for name, accepted in self.permission_terms)
+
+
+class PolicyEngine:
+    """
+    Evaluates compiled policy rules over the app list incrementally.
+    Apps are indexed by type and by (permission name, status), so a full pass
+    (new rules, first sync, or a large delta) only looks at each rule's candidate
+    apps. Rules are indexed by their index_terms(), so a small delta re-evaluates
+    each changed app against just the rules its type and permissions can trigger.
+    Apps are keyed by app_key(): (type, path) for file-based apps, else
+    (type, package_id).
+    """
+
+    def __init__(self, rules=None, source=None):
+        self.source = source
+        self.apps = {}        # key -> app
+        self._signatures = {} # key -> signature of the last evaluated state
+        self.by_type = {}     # type -> {key}
+        self.by_permission = {} # (permission name, status) -> {key}
+        self.violations = {}  # key -> {rule id}
+        self.violation_count = 0 # total (app, rule) pairs, kept up to date incrementally
+        self.load_rules(DEFAULT_POLICY_RULES if rules is None else rules)
+
+    @classmethod
+    def from_file(cls, path=POLICY_FILE):
+        """Builds an engine from a policy file, or from the defaults if it doesn't exist."""
+        if not os.path.exists(path):
+            return cls(source=None)
+        return cls(load_policy_rules(path), source=path)
+
+    @staticmethod
+    def _signature(app):
+        return (app['name'], tuple((p['name'], p['status']) for p in app['permissions']))
+
+    def load_rules(self, specs):
+        """Compiles rules (raising ValueError on a bad one) and re-evaluates everything."""
+        rules = [PolicyRule(spec) for spec in specs]
+        self.rules = {rule.id: rule for rule in rules}
+        self.rules_by_term = {}  # index term -> [rule]; see PolicyRule.index_terms()
+        for rule in rules:
+            for term in rule.index_terms():
+                self.rules_by_term.setdefault(term, []).append(rule)
+        self.evaluate_all()
+
+    # --- Indexes ---
+
+    def _index(self, key, app):
+        self.apps[key] = app
+        self._signatures[key] = self._signature(app)
+        self.by_type.setdefault(app['type'], set()).add(key)
+        for p in app['permissions']:
+            self.by_permission.setdefault((p['name'], p['status']), set()).add(key)
+
+    def _unindex(self, key):
+        app = self.apps.pop(key, None)
+        self._signatures.pop(key, None)
+        self.violation_count -= len(self.violations.pop(key, ()))
+        if app is None:
+            return
+        self.by_type.get(app['type'], set()).discard(key)
+        for p in app['permissions']:
+            self.by_permission.get((p['name'], p['status']), set()).discard(key)
+
+    def _candidates(self, rule):
+        """Keys that satisfy the rule's indexed terms, smallest set first."""
+        sets = []
+        if rule.app_type:
+            sets.append(self.by_type.get(rule.app_type, set()))
+        for name, accepted in rule.permission_terms:
+            sets.append(set().union(*(self.by_permission.get((name, status), set()) for status in accepted)))
+        if not sets:
+            return set(self.apps)
+        sets.sort(key=len)
+        return sets[0].intersection(*sets[1:])
+
+    # --- Evaluation ---
+
+    @staticmethod
+    def _app_terms(app):
+        yield None
+        yield ('type', app['type'])
+        for p in app['permissions']:
+            yield ('permission', p['name'], p['status'])
+
+    def _evaluate_app(self, key):
+        app = self.apps[key]
+        rules = {rule.id: rule for term in self._app_terms(app) for rule in self.rules_by_term.get(term, ())}
+        violated = {rule.id for rule in rules.values() if rule.matches(app)}
+        self.violation_count -= len(self.violations.pop(key, ()))
+        if violated:
+            self.violations[key] = violated
+            self.violation_count += len(violated)
+
+    def evaluate_all(self):
+        """Full pass over all rules using the app indexes."""
+        self.violations = {}
+        self.violation_count = 0
+        for rule in self.rules.values():
+            for key in self._candidates(rule):
+                if not rule.package or rule.package.search(self.apps[key]['package_id']):
+                    self.violations.setdefault(key, set()).add(rule.id)
+                    self.violation_count += 1
+
+    def update_apps(self, apps):
+        """Applies added or changed apps; cost is proportional to len(apps)."""
+        for app in apps:
+            key = app_key(app)
+            self._unindex(key)
+            self._index(key, app)
+            self._evaluate_app(key)
+
+    def remove_apps(self, keys):
+        for key in keys:
+            self._unindex(key)
+
+    def sync(self, app_data):
+        """
+        Brings the engine in line with a fresh scan. Only apps that were added,
+        removed or changed since the last sync are re-indexed and re-evaluated;
+        if that's a large share of the list, it re-indexes everything and does a
+        full pass instead. Returns the keys of those apps. For a known single-app
+        change, call update_apps()/remove_apps() directly and skip the diff.
+        """
+        current = {app_key(app): app for app in app_data}
+        removed = [key for key in self.apps if key not in current]
+        changed = [app for key, app in current.items() if self._signatures.get(key) != self._signature(app)]
+        if len(removed) + len(changed) > len(current) * POLICY_BULK_FRACTION:
+            self.apps, self._signatures, self.by_type, self.by_permission = {}, {}, {}, {}
+            for key, app in current.items():
+                self._index(key, app)
+            self.evaluate_all()
+            return removed + [app_key(app) for app in changed]
+        self.remove_apps(removed)
+        self.update_apps(changed)
+        # Unchanged apps still point at the freshest objects (ids, risk)
+        for key, app in current.items():
+            self.apps[key] = app
+        return removed + [app_key(app) for app in changed]
+
+    # --- Reporting ---
+
+    def violation_rows(self, keys=None):
+        """
+        One dict per (app, rule) violation, sorted by severity then app.
+        Pass keys to get only those apps' rows.
+        """
+        severity_order = {"High": 0, "Medium": 1, "Low": 2}
+        rows = []
+        for key in self.violations if keys is None else keys:
+            app = self.apps.get(key)
+            for rule_id in self.violations.get(key, ()):
+                rule = self.rules[rule_id]
+                rows.append({
+                    "key": key,
+                    "rule": rule.id,
+                    "description": rule.description,
+                    "severity": rule.severity,
+                    "name": app['name'],
+                    "type": app['type'],
+                    "package_id": app['package_id'],
+                })
+        rows.sort(key=lambda r: (severity_order.get(r['severity'], 3), r['name'], r['rule']))
+        return rows
+
+    def export_report(self, path):
+        """Writes the current violations to a JSON report."""
+        report = {
+            "format": "appscope-violations-report",
+            "version": 1,
+            "host": socket.gethostname(),
+            "created": int(time.time()),
+            "policy": self.source or "built-in defaults",
+            "rules": sorted(self.rules),
+            "apps_evaluated": len(self.apps),
+            "violations": [{k: v for k, v in row.items() if k != 'key'} for row in self.violation_rows()],
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        return path
+
+# --- Background Scan Scheduler (Always-on audits) ---
+
+SCAN_CHECK_INTERVAL = 120 # Seconds between cheap per-backend change checks
+SCAN_DEEP_INTERVAL = 900  # Seconds between full rescans (permissions, binaries)
+SCAN_CPU_BUDGET = 2.0     # CPU seconds a single cycle may use before backing off
+SCAN_MAX_LOAD = 0.75      # 1-minute loadavg per CPU above which cycles are skipped
+SCAN_MAX_BACKOFF = 8      # Largest multiplier applied to SCAN_CHECK_INTERVAL
+
+
+def _low_priority_prefix():
+    """Command prefix that runs a child at idle I/O and lowest CPU priority."""
+    prefix = []
+    if shutil.which('ionice'):
+        prefix += ['ionice', '-c', '3']
+    if shutil.which('nice'):
+        prefix += ['nice', '-n', '19']
+    return prefix
+
+
+class ScanScheduler:
+    """
+    Re-audits the system in the background around a SystemIntegrator.
+    Every cycle does a cheap fingerprint check per backend and rescans only
+    when something changed; a deep scan that bypasses all caches runs on a
+    longer interval. Scan commands run under nice/ionice, and cycles back off
+    when the machine is busy or a cycle overran its CPU budget. A cycle that
+    reaches its budget is stopped and keeps the previous app list; a scan
+    command's CPU time is only charged once it exits.
+    on_update(app_data, scan_failed) is called from the scheduler thread, and
+    only when the app list actually changed.
+    """
+
+    def __init__(self, integrator, on_update=None, check_interval=SCAN_CHECK_INTERVAL,
+                 deep_interval=SCAN_DEEP_INTERVAL, cpu_budget=SCAN_CPU_BUDGET,
+                 max_load=SCAN_MAX_LOAD, max_backoff=SCAN_MAX_BACKOFF):
+        self.integrator = integrator
+        self.on_update = on_update
+        self.check_interval = check_interval
+        self.deep_interval = deep_interval
+        self.cpu_budget = cpu_budget
+        self.max_load = max_load
+        self.max_backoff = max_backoff
+
+        self.backoff = 1
+        self.next_deep = time.monotonic() + deep_interval
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._deep_requested = False
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="appscope-scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive() and not self._stop.is_set()
+
+    def trigger(self, deep=False):
+        """Requests a cycle now (e.g. after an install or permission change)."""
+        self._deep_requested = self._deep_requested or deep
+        self._wake.set()
+
+    def _system_busy(self):
+        try:
+            load = os.getloadavg()[0] / (os.cpu_count() or 1)
+        except OSError:
+            return False
+        return load > self.max_load
+
+    def _cpu_time(self):
+        """
+        CPU seconds charged to scanning so far: the integrator's scan threads and
+        scan child processes, plus this scheduler thread. GUI work isn't counted.
+        """
+        return self.integrator.scan_cpu_time + time.thread_time()
+
+    def _app_signature(self, app_data):
+        return sorted((a['type'], a['package_id'], a['risk'], tuple((p['name'], p['status']) for p in a['permissions']))
+                      for a in app_data)
+
+    def run_cycle(self, triggered=False):
+        """
+        Runs one scheduling cycle. Returns True if a scan ran.
+        Triggered cycles skip the busy check; the CPU budget still applies.
+        """
+        if not triggered and self._system_busy():
+            self.backoff = min(self.backoff * 2, self.max_backoff)
+            return False
+
+        now = time.monotonic()
+        deep = self._deep_requested or now >= self.next_deep
+        self._deep_requested = False
+        if not deep and not self.integrator.changed_scanners():
+            self.backoff = 1
+            return False
+
+        integrator = self.integrator
+        start_cpu = self._cpu_time()
+        cpu_limit = start_cpu + self.cpu_budget
+        before = self._app_signature(integrator.app_data)
+        with integrator.scan_lock:
+            saved_prefix = integrator.command_prefix
+            integrator.command_prefix = _low_priority_prefix()
+            try:
+                app_data, scan_failed = integrator.scan_system(use_cache=not deep,
+                                                               should_stop=lambda: self._cpu_time() > cpu_limit)
+            finally:
+                integrator.command_prefix = saved_prefix
+        used = self._cpu_time() - start_cpu
+
+        if used > self.cpu_budget or integrator.scan_stopped:
+            # Overran the budget: stretch the interval in proportion
+            self.backoff = min(max(self.backoff * 2, math.ceil(used / self.cpu_budget)), self.max_backoff)
+            print(f"Background scan used {used:.1f}s CPU (budget {self.cpu_budget:.1f}s), "
+                  f"{'stopped' if integrator.scan_stopped else 'finished'}, backing off x{self.backoff}")
+        else:
+            self.backoff = 1
+        if deep:
+            # Counted from now, so repeated overruns don't keep stacking delays
+            self.next_deep = time.monotonic() + self.deep_interval * self.backoff
+
+        if integrator.scan_stopped:
+            return True
+        if self.on_update and self._app_signature(app_data) != before:
+            self.on_update(app_data, scan_failed)
+        return True
+
+    def _run(self):
+        try:
+            # Lower this thread (and the scanner threads it spawns) to the lowest CPU priority
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+        except (AttributeError, OSError):
+            pass
+
+        while not self._stop.is_set():
+            triggered = self._wake.wait(self.check_interval * self.backoff)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self.run_cycle(triggered)
+            except Exception as e:
+                print(f"Background scan failed: {e}")
+
+# --- Theming (In-place restyling of registered widgets) ---
+
+THEME_FILE = os.path.join(CONFIG_DIR, 'theme.json')
+DEFAULT_THEME = {
+    'primary': COLOR_PRIMARY,
+    'secondary': COLOR_SECONDARY,
+    'bg': COLOR_BG
+}
+
+
+class ThemeManager:
+    """
+    Owns the current theme colors, the single ttk.Style and every themed tk widget.
+    Widgets are registered once with the options that follow a theme key; a change
+    only reconfigures those options and the shared ttk styles in place (ttk widgets
+    such as the app rows pick the styles up without being rebuilt). Changes are
+    batched into one idle callback. save() persists the theme for the next
+    launch and is meant for committed choices, not every preview.
+    """
+
+    def __init__(self, root, path=THEME_FILE):
+        self.root = root
+        self.path = path
+        self.colors = dict(DEFAULT_THEME)
+        self.colors.update(self._load())
+        self._saved = dict(self.colors)
+        self.style = ttk.Style(root)
+        self.style.theme_use('clam')
+        self._widgets = {} # widget path -> (widget, {option: theme key})
+        self._pending = None
+        self.configure_styles()
+
+    def is_color(self, value):
+        try:
+            self.root.winfo_rgb(value)
+            return True
+        except tk.TclError:
+            return False
+
+    def _load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print(f"Could not read theme file {self.path}: {e}")
+            return {}
+        if not isinstance(saved, dict):
+            return {}
+        return {key: value for key, value in saved.items()
+                if key in DEFAULT_THEME and isinstance(value, str) and self.is_color(value)}
+
+    def save(self):
+        """Writes the theme file if the colors changed since the last save."""
+        if self.colors == self._saved:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump(self.colors, f, indent=2)
+            self._saved = dict(self.colors)
+        except OSError as e:
+            print(f"Could not save theme file {self.path}: {e}")
+
+    def register(self, widget, **options):
+        """Themes a tk widget, e.g. register(label, fg='primary', bg='bg'). Returns the widget."""
+        self._widgets[str(widget)] = (widget, options)
+        widget.configure(**{option: self.colors[key] for option, key in options.items()})
+        return widget
+
+    def set(self, key, value):
+        """Changes one theme color; the restyle happens on the next idle."""
+        if self.colors.get(key) != value:
+            self.colors[key] = value
+            self.schedule()
+
+    def schedule(self):
+        if self._pending is None:
+            self._pending = self.root.after_idle(self._flush)
+
+    def _flush(self):
+        self._pending = None
+        self.configure_styles()
+        for name, (widget, options) in list(self._widgets.items()):
+            try:
+                widget.configure(**{option: self.colors[key] for option, key in options.items()})
+            except tk.TclError:
+                # Widget was destroyed since it was registered
+                del self._widgets[name]
+
+    def configure_styles(self):
+        """Sets the ttk styles from the current colors; existing widgets update in place."""
+        style = self.style
+        
+        # Configure Frames and Labels based on theme
+        style.configure('TFrame', background='white')
+        style.configure('TLabel', background='white', foreground=self.colors['secondary'])
+        style.configure('TButton', background=self.colors['primary'], foreground='white', font=('Inter', 10, 'bold'))
+        style.configure('AppBg.TFrame', background=self.colors['bg'])
+        style.configure('AppBg.TCheckbutton', background=self.colors['bg'], foreground=self.colors['secondary'])
+        
+        # Configure Colored Buttons
+        style.configure('Danger.TButton', background=COLOR_DANGER, foreground='white')
+        style.map('Danger.TButton', background=[('active', '#b91c1c')])
+        style.configure('Safe.TButton', background=COLOR_SAFE, foreground='white')
+        style.map('Safe.TButton', background=[('active', '#047857')])
+
 # --- Main GUI Class ---
 
 class AppScope(tk.Tk):
@@ -322,44 +1493,34 @@ class AppScope(tk.Tk):
         self.title("AppScope: Linux Security Console")
         self.geometry("950x700")
         
-        # Initial Theme Configuration (Customizable)
-        self.current_theme = {
-            'primary': COLOR_PRIMARY,
-            'secondary': COLOR_SECONDARY,
-            'bg': COLOR_BG
-        }
-        
-        self.configure(bg=self.current_theme['bg'])
+        # Theme Configuration (Customizable, restored from the last session)
+        self.theme = ThemeManager(self)
+        self.theme.register(self, bg='bg')
         self.grid_rowconfigure(0, weight=1)
         self.grid_columnconfigure(0, weight=1)
 
-        self.apply_styles()
+        try:
+            self.policy = PolicyEngine.from_file()
+        except (OSError, ValueError) as e:
+            print(f"Could not load policy file {POLICY_FILE}: {e}. Using built-in rules.")
+            self.policy = PolicyEngine()
+
         self.create_widgets()
         
         # Initial Scan (Delay added to ensure status label renders first)
         self.show_status("Running initial system scan...", COLOR_PRIMARY)
         self.after(100, self._perform_scan_and_update)
         
-        self.current_app_id = None 
+        self.current_app_key = None 
 
-    def apply_styles(self):
-        """Sets or refreshes Tkinter styles based on current_theme."""
-        
-        # TTK Style Initialization
-        self.style = ttk.Style(self)
-        self.style.theme_use('clam')
-        
-        # Configure Frames and Labels based on theme
-        self.style.configure('TFrame', background='white')
-        self.style.configure('TLabel', background='white', foreground=self.current_theme['secondary'])
-        self.style.configure('TButton', background=self.current_theme['primary'], foreground='white', font=('Inter', 10, 'bold'))
-        self.style.configure('AppBg.TFrame', background=self.current_theme['bg'])
-        
-        # Configure Colored Buttons
-        self.style.configure('Danger.TButton', background=COLOR_DANGER, foreground='white')
-        self.style.map('Danger.TButton', background=[('active', '#b91c1c')])
-        self.style.configure('Safe.TButton', background=COLOR_SAFE, foreground='white')
-        self.style.map('Safe.TButton', background=[('active', '#047857')])
+        # Work that may wait on a background scan runs off the Tk thread; results come back through this queue
+        self.task_results = queue.Queue()
+        self._tasks_running = 0
+
+        # Background audits: results are handed over through a queue and picked up on the Tk thread
+        self.background_results = queue.Queue()
+        self.scheduler = ScanScheduler(self.app_manager, on_update=lambda *result: self.background_results.put(result))
+        self.after(1000, self._poll_background_scans)
 
     def create_widgets(self):
         # Notebook (Tabs)
@@ -376,8 +1537,13 @@ class AppScope(tk.Tk):
         self.notebook.add(settings_frame, text="⚙️ Settings & Appearance")
         self.create_settings_panel(settings_frame)
 
+        # --- Tab 3: Compliance Policy ---
+        policy_frame = ttk.Frame(self.notebook, style='AppBg.TFrame', padding="10")
+        self.notebook.add(policy_frame, text="📋 Compliance Policy")
+        self.create_policy_panel(policy_frame)
+
         # 5. Status Message (Bottom)
-        self.status_label = tk.Label(self, text="", fg="white", bg=COLOR_SECONDARY, bd=0, relief="flat", font=('Inter', 10), anchor="w")
+        self.status_label = tk.Label(self, text="", fg="white", bg=self.theme.colors['secondary'], bd=0, relief="flat", font=('Inter', 10), anchor="w")
         self.status_label.grid(row=1, column=0, sticky="ew")
 
     def create_dashboard(self, parent_frame):
@@ -387,20 +1553,27 @@ class AppScope(tk.Tk):
         parent_frame.grid_columnconfigure(1, weight=1)
 
         # Header
-        header_frame = tk.Frame(parent_frame, bg=self.current_theme['bg'], padx=0, pady=0)
+        header_frame = self.theme.register(tk.Frame(parent_frame, padx=0, pady=0), bg='bg')
         header_frame.grid(row=0, column=0, columnspan=2, sticky="ew", pady=(0, 10))
         
         # Title and Subtitle
-        tk.Label(header_frame, text="AppScope: Unified Security", font=('Inter', 20, 'bold'), fg=self.current_theme['primary'], bg=self.current_theme['bg']).pack(anchor="w")
-        tk.Label(header_frame, text="Audit, modify, and manage security access across all package types.", fg="#6b7280", bg=self.current_theme['bg']).pack(anchor="w")
+        self.theme.register(tk.Label(header_frame, text="AppScope: Unified Security", font=('Inter', 20, 'bold')), fg='primary', bg='bg').pack(anchor="w")
+        self.theme.register(tk.Label(header_frame, text="Audit, modify, and manage security access across all package types.", fg="#6b7280"), bg='bg').pack(anchor="w")
 
         # --- REFRESH BUTTON FRAME ---
-        refresh_frame = tk.Frame(header_frame, bg=self.current_theme['bg'])
+        refresh_frame = self.theme.register(tk.Frame(header_frame), bg='bg')
         refresh_frame.pack(anchor="w", fill='x', pady=(10, 0))
 
         ttk.Button(refresh_frame, 
                    text="🔄 Refresh App List (Live Scan)", 
                    command=self.refresh_data).pack(side='left')
+
+        self.background_audits = tk.BooleanVar(value=True)
+        ttk.Checkbutton(refresh_frame,
+                        text="Background audits",
+                        style='AppBg.TCheckbutton',
+                        variable=self.background_audits,
+                        command=self.toggle_background_audits).pack(side='left', padx=10)
         # --- END REFRESH FRAME ---
 
         # 3. Application List Panel (Left)
@@ -433,66 +1606,228 @@ class AppScope(tk.Tk):
         self.permission_details_frame.grid(row=1, column=0, sticky="nsew")
         self.show_placeholder()
 
+    def run_task(self, work, done):
+        """
+        Runs work() on a worker thread, so a scan waiting on the background
+        scheduler never freezes the window, then calls done(result, error) on the Tk thread.
+        """
+        def runner():
+            try:
+                outcome = (work(), None)
+            except Exception as e:
+                outcome = (None, e)
+            self.task_results.put((done, outcome))
+
+        self._tasks_running += 1
+        threading.Thread(target=runner, daemon=True).start()
+        if self._tasks_running == 1:
+            self.after(50, self._poll_tasks)
+
+    def _poll_tasks(self):
+        """Delivers finished task results on the Tk thread."""
+        while not self.task_results.empty():
+            done, (result, error) = self.task_results.get_nowait()
+            self._tasks_running -= 1
+            done(result, error)
+        if self._tasks_running:
+            self.after(50, self._poll_tasks)
+
     def refresh_data(self):
         """Triggers a system scan and updates the GUI."""
         self.show_status("Scanning system for changes...", COLOR_PRIMARY)
         self.after(100, self._perform_scan_and_update)
 
     def _perform_scan_and_update(self):
-        """Performs the scan and updates the GUI, called after a slight delay."""
-        try:
-            _, scan_failed = self.app_manager.scan_system()
+        """Starts the scan and updates the GUI when it's done, called after a slight delay."""
+        self.run_task(self.app_manager.scan_system, self._scan_finished)
+
+    def _scan_finished(self, result, error):
+        if error:
+            self.show_status(f"Fatal Scan Error: {error}", COLOR_DANGER)
+        else:
+            _, scan_failed = result
             self.render_app_list()
+            self.refresh_policy()
             self.show_placeholder()
             
             if scan_failed:
                 self.show_status("Scan Complete. Some package managers failed to respond or returned empty results.", COLOR_WARNING)
             else:
                 self.show_status("Scan Complete. App list updated.", COLOR_SAFE)
-        except Exception as e:
-            self.show_status(f"Fatal Scan Error: {e}", COLOR_DANGER)
 
+        if self.background_audits.get():
+            self.scheduler.start()
+
+    def _poll_background_scans(self):
+        """Applies results from the background scheduler on the Tk thread."""
+        latest = None
+        while not self.background_results.empty():
+            latest = self.background_results.get_nowait()
+
+        if latest:
+            _, scan_failed = latest
+            self.render_app_list()
+            self.refresh_policy()
+            # Redraw the open detail view from the fresh data, or close it if the app is gone
+            if self.current_app_key is not None:
+                app = self.app_manager.find_app(self.current_app_key)
+                if app:
+                    self.show_app_details(app)
+                else:
+                    self.show_placeholder()
+            self.show_status("Background audit found changes. App list updated.", COLOR_WARNING if scan_failed else COLOR_PRIMARY)
+
+        self.after(1000, self._poll_background_scans)
+
+    def toggle_background_audits(self):
+        """Starts or stops the background scan scheduler."""
+        if self.background_audits.get():
+            self.scheduler.start()
+            self.show_status("Background audits enabled.", COLOR_SAFE)
+        else:
+            self.scheduler.stop()
+            self.show_status("Background audits disabled.", COLOR_WARNING)
+
+
+    def create_policy_panel(self, parent_frame):
+        """Creates the compliance policy panel: rule source, violations list and export."""
+        parent_frame.grid_rowconfigure(2, weight=1)
+        parent_frame.grid_columnconfigure(0, weight=1)
+
+        self.theme.register(tk.Label(parent_frame, 
+                                     text="Policy Violations", 
+                                     font=('Inter', 18, 'bold')),
+                            fg='primary', bg='bg').grid(row=0, column=0, sticky="w", pady=(0, 10))
+
+        actions_frame = ttk.Frame(parent_frame, padding=10)
+        actions_frame.grid(row=1, column=0, sticky="ew", pady=(0, 10))
+
+        ttk.Button(actions_frame, 
+                   text="Load Policy File", 
+                   command=self.load_policy_file).pack(side='left')
+        ttk.Button(actions_frame, 
+                   text="Export Violations Report", 
+                   command=self.export_policy_report).pack(side='left', padx=10)
+
+        self.policy_summary = ttk.Label(actions_frame, text="", foreground="#6b7280")
+        self.policy_summary.pack(side='left', padx=10)
+
+        columns = ("severity", "rule", "name", "type", "package_id")
+        self.violations_tree = ttk.Treeview(parent_frame, columns=columns, show="headings")
+        for column, heading, width in zip(columns, ("Severity", "Rule", "Application", "Type", "Package"), (80, 200, 180, 80, 220)):
+            self.violations_tree.heading(column, text=heading)
+            self.violations_tree.column(column, width=width, anchor="w")
+        self.violations_tree.grid(row=2, column=0, sticky="nsew")
+
+        tree_scrollbar = ttk.Scrollbar(parent_frame, orient="vertical", command=self.violations_tree.yview)
+        tree_scrollbar.grid(row=2, column=1, sticky="ns")
+        self.violations_tree.configure(yscrollcommand=tree_scrollbar.set)
+
+        for level, color in RISK_COLORS.items():
+            self.violations_tree.tag_configure(level, foreground=color)
+        self._violation_items = {} # app key -> Treeview items, so one app's rows can be replaced alone
+
+    def refresh_policy(self):
+        """Syncs the policy engine after a full scan and redraws only the rows of apps that changed."""
+        self.update_policy_rows(self.policy.sync(self.app_manager.app_data))
+
+    def policy_app_changed(self, app=None, removed_key=None):
+        """Single-app delta: re-evaluates and redraws just that app."""
+        if app is not None:
+            self.policy.update_apps([app])
+            self.update_policy_rows([app_key(app)])
+        if removed_key is not None:
+            self.policy.remove_apps([removed_key])
+            self.update_policy_rows([removed_key])
+
+    def update_policy_rows(self, keys=None):
+        """Replaces the violations view rows of the given apps (all apps if keys is None)."""
+        if keys is None:
+            self.violations_tree.delete(*self.violations_tree.get_children())
+            self._violation_items = {}
+        else:
+            for key in keys:
+                items = self._violation_items.pop(key, ())
+                if items:
+                    self.violations_tree.delete(*items)
+
+        for row in self.policy.violation_rows(keys):
+            item = self.violations_tree.insert("", "end", values=(row['severity'], row['rule'], row['name'], row['type'], row['package_id']), tags=(row['severity'],))
+            self._violation_items.setdefault(row['key'], []).append(item)
+
+        source = os.path.basename(self.policy.source) if self.policy.source else "built-in rules"
+        self.policy_summary.configure(text=f"{self.policy.violation_count} violation(s) across {len(self.policy.violations)} app(s) · {len(self.policy.rules)} rules from {source}")
+
+    def load_policy_file(self):
+        """Loads policy rules from a user-chosen JSON file."""
+        path = filedialog.askopenfilename(title="Load Policy File", initialdir=CONFIG_DIR if os.path.isdir(CONFIG_DIR) else os.path.expanduser('~'), filetypes=[("Policy files", "*.json"), ("All files", "*")])
+        if not path:
+            return
+        try:
+            self.policy = PolicyEngine(load_policy_rules(path), source=path)
+        except (OSError, ValueError) as e:
+            self.show_status(f"Could not load policy: {e}", COLOR_DANGER)
+            return
+        self.policy.sync(self.app_manager.app_data)
+        self.update_policy_rows()
+        self.show_status(f"Loaded {len(self.policy.rules)} policy rules from {path}.", COLOR_SAFE)
+
+    def export_policy_report(self):
+        """Exports the current violations to a JSON report."""
+        path = filedialog.asksaveasfilename(title="Export Violations Report", defaultextension=".json", initialfile="appscope-violations.json", filetypes=[("JSON report", "*.json")])
+        if not path:
+            return
+        try:
+            self.policy.export_report(path)
+        except OSError as e:
+            self.show_status(f"Could not write report: {e}", COLOR_DANGER)
+            return
+        self.show_status(f"Violations report written to {path}.", COLOR_SAFE)
 
     def create_settings_panel(self, parent_frame):
         """Creates the panel for user customization (Theme, Background, Logos)."""
         
-        tk.Label(parent_frame, 
-                 text="Appearance Settings", 
-                 font=('Inter', 18, 'bold'), 
-                 fg=self.current_theme['primary'], 
-                 bg=self.current_theme['bg']).pack(anchor="w", pady=(0, 15))
+        self.theme.register(tk.Label(parent_frame, 
+                                     text="Appearance Settings", 
+                                     font=('Inter', 18, 'bold')),
+                            fg='primary', bg='bg').pack(anchor="w", pady=(0, 15))
+
+        # Typing a hex value previews it live; picking from the dialog fills it in
+        self.color_vars = {}
 
         # --- 1. Theme Color Chooser ---
         theme_frame = ttk.Frame(parent_frame, padding=15)
         theme_frame.pack(fill='x', pady=5, padx=10)
         ttk.Label(theme_frame, text="Primary Theme Color:", font=('Inter', 12, 'bold')).grid(row=0, column=0, sticky='w', padx=5, pady=5)
         
-        self.color_display = tk.Label(theme_frame, text="  ", bg=self.current_theme['primary'], width=4)
+        self.color_display = self.theme.register(tk.Label(theme_frame, text="  ", width=4), bg='primary')
         self.color_display.grid(row=0, column=1, padx=5, pady=5, sticky='w')
+        self.create_color_entry(theme_frame, 'primary').grid(row=0, column=2, padx=5, sticky='w')
         
         ttk.Button(theme_frame, 
                    text="Select Color", 
-                   command=self.choose_primary_color).grid(row=0, column=2, padx=15, sticky='w')
+                   command=self.choose_primary_color).grid(row=0, column=3, padx=15, sticky='w')
 
         # --- 2. Background Color Chooser ---
         bg_frame = ttk.Frame(parent_frame, padding=15)
         bg_frame.pack(fill='x', pady=5, padx=10)
         ttk.Label(bg_frame, text="App Background Color:", font=('Inter', 12, 'bold')).grid(row=0, column=0, sticky='w', padx=5, pady=5)
         
-        self.bg_display = tk.Label(bg_frame, text="  ", bg=self.current_theme['bg'], width=4)
+        self.bg_display = self.theme.register(tk.Label(bg_frame, text="  ", width=4), bg='bg')
         self.bg_display.grid(row=0, column=1, padx=5, pady=5, sticky='w')
+        self.create_color_entry(bg_frame, 'bg').grid(row=0, column=2, padx=5, sticky='w')
         
         ttk.Button(bg_frame, 
                    text="Select Background", 
-                   command=self.choose_background_color).grid(row=0, column=2, padx=15, sticky='w')
+                   command=self.choose_background_color).grid(row=0, column=3, padx=15, sticky='w')
                    
         # --- 3. Logo/Icon Customization (Blueprint) ---
         logo_frame = ttk.Frame(parent_frame, padding=15)
         logo_frame.pack(fill='x', pady=(20, 5), padx=10)
-        tk.Label(logo_frame, 
-                 text="Logo & Icon Customization (Blueprint)", 
-                 font=('Inter', 12, 'bold'), 
-                 fg=COLOR_SECONDARY).pack(anchor="w")
+        self.theme.register(tk.Label(logo_frame, 
+                                     text="Logo & Icon Customization (Blueprint)", 
+                                     font=('Inter', 12, 'bold')),
+                            fg='secondary').pack(anchor="w")
         
         # Icon Path Input
         ttk.Label(logo_frame, text="New Icon Path (.png or .svg):", foreground="#6b7280").pack(anchor="w", pady=(5, 2))
@@ -518,35 +1853,45 @@ class AppScope(tk.Tk):
         # Blueprint for the user
         self.show_status(f"Icon change BLUEPRINT: On your host system, you need to write Python code to edit the .desktop file and run 'gtk-update-icon-cache'.", COLOR_WARNING)
     
+    def create_color_entry(self, parent_frame, key):
+        """
+        Creates a hex entry for a theme color that previews valid values as they
+        are typed; the color is saved once the entry is committed (Enter or focus-out).
+        """
+        var = tk.StringVar(value=self.theme.colors[key])
+        var.trace_add('write', partial(self.preview_color, key, var))
+        self.color_vars[key] = var
+        entry = ttk.Entry(parent_frame, textvariable=var, width=9)
+        entry.bind('<Return>', lambda e: self.theme.save())
+        entry.bind('<FocusOut>', lambda e: self.theme.save())
+        return entry
+
+    def preview_color(self, key, var, *_):
+        """Applies a typed color once it is valid; the restyle is batched by the theme."""
+        value = var.get().strip()
+        if value and self.theme.is_color(value):
+            self.theme.set(key, value)
+
     def choose_primary_color(self):
         """Opens color chooser for the primary theme color."""
-        color_code = colorchooser.askcolor(title="Choose Primary Theme Color")[1]
+        color_code = colorchooser.askcolor(color=self.theme.colors['primary'], title="Choose Primary Theme Color")[1]
         if color_code:
-            self.current_theme['primary'] = color_code
-            self.color_display.config(bg=color_code)
-            self.reapply_theme()
+            self.color_vars['primary'].set(color_code)
+            self.theme.save()
             self.show_status(f"Primary theme color set to {color_code}!", COLOR_SAFE)
 
     def choose_background_color(self):
         """Opens color chooser for the main background color."""
-        color_code = colorchooser.askcolor(title="Choose Background Color")[1]
+        color_code = colorchooser.askcolor(color=self.theme.colors['bg'], title="Choose Background Color")[1]
         if color_code:
-            self.current_theme['bg'] = color_code
-            self.bg_display.config(bg=color_code)
-            self.reapply_theme()
+            self.color_vars['bg'].set(color_code)
+            self.theme.save()
             self.show_status(f"Background color set to {color_code}!", COLOR_SAFE)
 
-    def reapply_theme(self):
-        """Reapplies styles and refreshes the main UI."""
-        self.configure(bg=self.current_theme['bg'])
-        self.apply_styles()
-        self.render_app_list()
-        self.notebook.winfo_children()[0].config(style='AppBg.TFrame')
-        self.notebook.winfo_children()[1].config(style='AppBg.TFrame')
-
 
     def show_placeholder(self):
         """Displays the 'Select an app' placeholder message."""
+        self.current_app_key = None
         for widget in self.permission_details_frame.winfo_children():
             widget.destroy()
 
@@ -587,7 +1932,7 @@ class AppScope(tk.Tk):
 
     def show_app_details(self, app):
         """Renders the detailed permissions and action buttons for the selected app."""
-        self.current_app_id = app["id"]
+        self.current_app_key = app_key(app)
         
         for widget in self.permission_details_frame.winfo_children():
             widget.destroy()
@@ -618,7 +1963,7 @@ class AppScope(tk.Tk):
         permissions_frame.grid_columnconfigure(0, weight=1)
 
         for i, p in enumerate(app['permissions']):
-            self.render_permission_row(permissions_frame, p, i, app['id'])
+            self.render_permission_row(permissions_frame, p, i, app_key(app))
             
         # --- Uninstall Section ---
         ttk.Separator(self.permission_details_frame).pack(fill="x", pady=15)
@@ -634,7 +1979,7 @@ class AppScope(tk.Tk):
         ttk.Button(uninstall_frame, 
                    text=f"Uninstall {app['name']}",
                    style='Danger.TButton',
-                   command=partial(self.confirm_uninstall, app['name'], app['id'])
+                   command=partial(self.confirm_uninstall, app['name'], app_key(app))
                    ).grid(row=0, column=1, padx=10)
         
         ttk.Label(uninstall_frame, 
@@ -653,8 +1998,8 @@ class AppScope(tk.Tk):
         elif app['type'] == 'Snap':
              # Snap's current symlink pointing to the live version
              config_dir = os.path.expanduser(f"~/snap/{app['package_id']}/current")
-        elif app['type'] == 'Native':
-             # Default to XDG Base Directory Specification for Native apps
+        elif app['type'] in UNSANDBOXED_TYPES:
+             # Default to XDG Base Directory Specification for unsandboxed apps
              config_dir = os.path.expanduser(f"~/.config/{app_name_clean}")
              
         try:
@@ -670,7 +2015,7 @@ class AppScope(tk.Tk):
              self.show_status("Failed to open folder. Check if the directory exists.", COLOR_WARNING)
 
 
-    def render_permission_row(self, parent_frame, permission, row_index, app_id):
+    def render_permission_row(self, parent_frame, permission, row_index, key):
         """Renders a single permission row with status and toggle button."""
         
         p_frame = ttk.Frame(parent_frame, padding=8, relief='groove', borderwidth=1)
@@ -696,7 +2041,7 @@ class AppScope(tk.Tk):
             toggle_button = ttk.Button(p_frame, 
                                     text=button_text, 
                                     style='Danger.TButton' if is_enabled else 'Safe.TButton',
-                                    command=partial(self.toggle_permission, app_id, permission['id'], new_status))
+                                    command=partial(self.toggle_permission, key, permission['id'], new_status))
             toggle_button.grid(row=0, column=1, rowspan=2, padx=10, sticky="e")
         else:
             # Placeholder for Native apps where permissions can't be revoked easily
@@ -706,21 +2051,27 @@ class AppScope(tk.Tk):
                      font=('Inter', 9, 'italic')).grid(row=0, column=1, rowspan=2, padx=10, sticky="e")
 
 
-    def toggle_permission(self, app_id, permission_id, new_status):
+    def toggle_permission(self, key, permission_id, new_status):
         """Handles permission toggling."""
-        
-        success = self.app_manager.update_permission(app_id, permission_id, new_status)
+        self.show_status("Updating permission...", COLOR_PRIMARY)
+        self.run_task(partial(self.app_manager.update_permission, key, permission_id, new_status),
+                      partial(self._permission_updated, key, new_status))
+
+    def _permission_updated(self, key, new_status, success, error):
+        if error:
+            print(f"Permission Update FAILED: {error}")
 
         if success:
-            app = next((a for a in self.app_manager.app_data if a['id'] == app_id), None)
+            app = self.app_manager.find_app(key)
             if app:
                 self.show_app_details(app)
                 self.render_app_list()
+                self.policy_app_changed(app)
                 self.show_status(f"Permission '{new_status}' for {app['name']} executed.", COLOR_SAFE if new_status == 'Enabled' else COLOR_WARNING)
         else:
             self.show_status("Error: Could not update permission. Check terminal for failure details.", COLOR_DANGER)
             
-    def confirm_uninstall(self, app_name, app_id):
+    def confirm_uninstall(self, app_name, key):
         """Confirms uninstallation before executing."""
         result = messagebox.askyesno(
             "Confirm Uninstall (DANGEROUS ACTION)",
@@ -728,16 +2079,24 @@ class AppScope(tk.Tk):
         )
         
         if result:
-            self.execute_uninstall(app_name, app_id)
+            self.execute_uninstall(app_name, key)
 
-    def execute_uninstall(self, app_name, app_id):
+    def execute_uninstall(self, app_name, key):
         """Executes the uninstallation process."""
-        
-        success = self.app_manager.uninstall_app(app_id)
-        
+        self.show_status(f"Uninstalling {app_name}...", COLOR_PRIMARY)
+        self.run_task(partial(self.app_manager.uninstall_app, key),
+                      partial(self._uninstall_finished, app_name, key))
+
+    def _uninstall_finished(self, app_name, key, success, error):
+        if error:
+            print(f"Uninstall FAILED: {error}")
+
         if success:
             self.show_placeholder()
             self.render_app_list()
+            self.policy_app_changed(removed_key=key)
+            # Let the background auditor confirm the removal against the package managers
+            self.scheduler.trigger()
             self.show_status(f"Uninstall command successful for {app_name}. Check your system for confirmation.", COLOR_DANGER)
         else:
             self.show_status(f"Uninstall command FAILED for {app_name}. See terminal output.", COLOR_WARNING)
@@ -750,9 +2109,32 @@ class AppScope(tk.Tk):
         
         if hasattr(self, '_status_timer'):
             self.after_cancel(self._status_timer)
-        self._status_timer = self.after(4000, lambda: self.status_label.configure(text="", bg=COLOR_SECONDARY))
+        self._status_timer = self.after(4000, lambda: self.status_label.configure(text="", bg=self.theme.colors['secondary']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AppScope: Linux Security Console")
+    parser.add_argument('--export-snapshot', metavar='PATH', help="scan this host, write a fleet snapshot and exit")
+    parser.add_argument('--fleet-report', metavar='DIR', help="aggregate all snapshots under DIR and exit")
+    parser.add_argument('--output', metavar='PATH', default='appscope-fleet-report.json', help="where to write the fleet report")
+    args = parser.parse_args()
+
+    if args.export_snapshot:
+        integrator = SystemIntegrator([])
+        _, scan_failed = integrator.scan_system()
+        if scan_failed:
+            # Don't let fallback or partial data masquerade as this host's inventory
+            print("Scan failed: a package manager failed or none returned results. No snapshot written.")
+            sys.exit(1)
+        print(f"Snapshot written to {integrator.export_snapshot(args.export_snapshot)}")
+    elif args.fleet_report:
+        aggregator = FleetAggregator().add_snapshots(iter_snapshot_paths(args.fleet_report))
+        aggregator.export_report(args.output)
+        print(f"Fleet report for {aggregator.hosts} hosts ({aggregator.skipped} skipped, {aggregator.superseded} superseded) written to {args.output}")
+    else:
+        app = AppScope()
+        app.mainloop()
 
 
 if __name__ == "__main__":
-    app = AppScope()
-    app.mainloop()
+    main()